@@ -1,8 +1,13 @@
+import csv
+import os
+import threading
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from datetime import date
-from io import BytesIO
 
 # --- Configuración de la Página ---
 st.set_page_config(
@@ -11,64 +16,246 @@ st.set_page_config(
 )
 
 # --- Variables de Estado para Almacenamiento (Simulación de DB) ---
+# Columnas de baja cardinalidad: se guardan como 'category' (códigos enteros en lugar de strings)
+CATEGORIAS = {
+    'Tipo de Cliente': pd.CategoricalDtype(['Nuevo', 'Antiguo']),
+    '¿Conductor?': pd.CategoricalDtype(['Con Conductor', 'Sin Conductor']),
+}
+# Columnas de la tabla, en el orden de registro
+COLUMNS = (
+    'Fecha de Servicio', 'Empresa', 'RUC', 'Tiempo de Servicio (días)', '¿Conductor?', 'Precio',
+    'Contacto', 'Email', 'Teléfono', 'Score (0-1000)', 'Trabajadores', 'Tipo de Cliente',
+)
+# Esquema Arrow del almacenamiento en memoria (las columnas de baja cardinalidad van codificadas como diccionario)
+SCHEMA = pa.schema([
+    ('Fecha de Servicio', pa.date32()),
+    ('Empresa', pa.string()),
+    ('RUC', pa.string()),
+    ('Tiempo de Servicio (días)', pa.int64()),
+    ('¿Conductor?', pa.dictionary(pa.int8(), pa.string())),
+    ('Precio', pa.float64()),
+    ('Contacto', pa.string()),
+    ('Email', pa.string()),
+    ('Teléfono', pa.string()),
+    ('Score (0-1000)', pa.int64()),
+    ('Trabajadores', pa.int64()),
+    ('Tipo de Cliente', pa.dictionary(pa.int8(), pa.string())),
+])
+# Tipos de la vista pandas, para no depender de la inferencia de pandas.
+# La fecha se mantiene como datetime64 (Plotly la maneja nativamente).
+DTYPES = {
+    'Fecha de Servicio': 'datetime64[ns]',
+    'Empresa': 'object',
+    'RUC': 'object',
+    'Tiempo de Servicio (días)': 'int64',
+    'Precio': 'float64',
+    'Contacto': 'object',
+    'Email': 'object',
+    'Teléfono': 'object',
+    'Score (0-1000)': 'int64',
+    'Trabajadores': 'int64',
+    **CATEGORIAS,
+}
+
+@st.cache_data(max_entries=1)
+def _load_feather(mtime: float) -> pa.Table:
+    """Lee el archivo Feather de clientes. Se cachea por fecha de modificación para no releerlo en cada rerun.
+
+    Solo se guarda la última versión: cada compactación reescribe el archivo y las anteriores ya no sirven.
+    """
+    # cast es inmediato salvo en archivos escritos desde pandas (fechas como timestamp, strings como object).
+    # La tabla se mantiene ordenada por fecha; ordenar un archivo ya ordenado es barato y cubre los antiguos.
+    return feather.read_table("crm_data.feather").cast(SCHEMA).sort_by('Fecha de Servicio')
+
+def _read_csv_table(path):
+    """Lee un CSV con las columnas de la tabla y lo convierte al esquema Arrow."""
+    dtype = {c: t for c, t in DTYPES.items() if c != 'Fecha de Servicio'}
+    df = pd.read_csv(path, parse_dates=['Fecha de Servicio'], dtype=dtype)
+    return pa.Table.from_pandas(df[list(COLUMNS)], preserve_index=False).cast(SCHEMA)
+
+@st.cache_resource
+def _data_lock():
+    """Lock compartido por todas las sesiones del proceso para el diario y el archivo Feather."""
+    return threading.Lock()
+
+def _write_feather(table):
+    """Escribe el archivo Feather a través de un temporal, para que nunca quede a medio escribir."""
+    feather.write_feather(table, "crm_data.feather.tmp")
+    os.replace("crm_data.feather.tmp", "crm_data.feather")
+
+def _finish_compaction():
+    """Completa una compactación interrumpida después de escribir el Feather temporal, sin repetir el diario."""
+    if os.path.exists("crm_data_journal.done.csv"):
+        if os.path.exists("crm_data.feather.tmp"):
+            os.replace("crm_data.feather.tmp", "crm_data.feather")
+        os.remove("crm_data_journal.done.csv")
+
 def init_data():
-    """Inicializa el DataFrame de clientes, cargando desde CSV o creando uno nuevo."""
-    try:
-        df = pd.read_csv("crm_data.csv")
-        # Asegura que las fechas se manejen correctamente
-        df['Fecha de Servicio'] = pd.to_datetime(df['Fecha de Servicio']).dt.date
-    except FileNotFoundError:
-        # Columnas según lo solicitado
-        data = {
-            'Fecha de Servicio': [],
-            'Empresa': [],
-            'RUC': [],
-            'Tiempo de Servicio (días)': [],
-            '¿Conductor?': [],
-            'Precio': [],
-            'Contacto': [],
-            'Email': [],
-            'Teléfono': [],
-            'Score (0-1000)': [],
-            'Trabajadores': [],
-            'Tipo de Cliente': [],
-        }
-        df = pd.DataFrame(data)
-    
-    if 'clientes_df' not in st.session_state:
-        st.session_state['clientes_df'] = df
+    """Inicializa la tabla Arrow de clientes, cargando desde Feather o creando una nueva."""
+    if 'arrow' in st.session_state:
+        return
+
+    with _data_lock():
+        _finish_compaction()
+        try:
+            table = _load_feather(os.path.getmtime("crm_data.feather"))
+        except FileNotFoundError:
+            if os.path.exists("crm_data.csv"):
+                # Migración única desde la versión que guardaba en CSV; el CSV se deja intacto
+                table = _read_csv_table("crm_data.csv").sort_by('Fecha de Servicio')
+                _write_feather(table)
+            else:
+                # Columnas según lo solicitado
+                table = SCHEMA.empty_table()
 
-# Guarda los datos en un archivo CSV (simulación de persistencia)
-def save_data():
-    st.session_state['clientes_df'].to_csv("crm_data.csv", index=False)
+        # Compacta el diario en el archivo Feather (una vez por sesión, no en cada registro).
+        # El diario se renombra antes de leerlo: lo que se registre mientras tanto va a un diario nuevo.
+        # Si quedó uno renombrado de una compactación interrumpida antes de escribir el Feather, se compacta ese primero.
+        if not os.path.exists("crm_data_journal.compacting.csv"):
+            try:
+                os.replace("crm_data_journal.csv", "crm_data_journal.compacting.csv")
+            except FileNotFoundError:
+                pass
+        if os.path.exists("crm_data_journal.compacting.csv"):
+            journal = _read_csv_table("crm_data_journal.compacting.csv")
+            table = pa.concat_tables([table, journal]).sort_by('Fecha de Servicio')
+            feather.write_feather(table, "crm_data.feather.tmp")
+            # El temporal ya incluye el diario: el marcador 'done' evita volver a sumarlo si algo se interrumpe
+            os.replace("crm_data_journal.compacting.csv", "crm_data_journal.done.csv")
+            os.replace("crm_data.feather.tmp", "crm_data.feather")
+            os.remove("crm_data_journal.done.csv")
+
+    st.session_state['arrow'] = table
+
+# Cada registro añade un bloque por columna; pasado este número se unen en uno solo
+MAX_CHUNKS = 32
+
+def insert_sorted(table, new_table, fecha):
+    """Inserta un registro manteniendo la tabla ordenada por Fecha de Servicio (sin reordenarla completa)."""
+    n = table.num_rows
+    if n == 0 or fecha >= table['Fecha de Servicio'][n - 1].as_py():
+        # Caso habitual: la fecha es la más reciente, basta con añadir al final
+        table = pa.concat_tables([table, new_table])
+    else:
+        # Después de las filas con la misma fecha, para que los registros nuevos queden primero en la vista descendente
+        fechas = table['Fecha de Servicio'].to_numpy()
+        i = int(np.searchsorted(fechas, np.datetime64(fecha, 'D'), side='right'))
+        table = pa.concat_tables([table.slice(0, i), new_table, table.slice(i)])
+    # Muchos bloques pequeños hacen más lentos to_numpy, to_pandas y la unificación de diccionarios
+    if table.column(0).num_chunks > MAX_CHUNKS:
+        table = table.combine_chunks()
+    return table
+
+def clientes_df():
+    """Vista pandas de la tabla Arrow para la UI; se convierte solo tras un nuevo registro."""
+    rev = st.session_state.get('rev', 0)
+    memo = st.session_state.get('clientes_df')
+    if memo is None or memo[0] != rev:
+        # astype fija las categorías y la resolución de la fecha (to_pandas entrega datetime64[ms])
+        df = st.session_state['arrow'].to_pandas(date_as_object=False).astype(DTYPES)
+        memo = st.session_state['clientes_df'] = (rev, df)
+    return memo[1]
+
+# Añade un registro al diario CSV (simulación de persistencia) sin reescribir la tabla completa
+def append_data(entry):
+    # Mismo lock que la compactación, para no escribir en un diario que se está renombrando
+    with _data_lock():
+        write_header = not os.path.exists("crm_data_journal.csv")
+        # Sin flush/fsync por registro: el buffer del sistema operativo se encarga
+        with open("crm_data_journal.csv", "a", newline="", encoding="utf-8", buffering=1 << 16) as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(COLUMNS)
+            writer.writerow(entry)
 
 init_data()
 
+# --- Agregaciones ---
+# Sin st.cache_data: hashear el DataFrame filtrado para la clave cuesta más que recalcular
+def _resumen_por_tipo(df):
+    """Conteo, precio promedio y score promedio por Tipo de Cliente en una sola pasada."""
+    return df.groupby('Tipo de Cliente', observed=True).agg(
+        n=('RUC', 'size'),
+        precio_mean=('Precio', 'mean'),
+        score_mean=('Score (0-1000)', 'mean'),
+    )
+
+def _filter_domain(df):
+    """Tipos de cliente y rango de precios para los filtros; se recalculan solo tras un nuevo registro."""
+    # Memo por sesión con el contador 'rev': las tablas de distintas sesiones difieren, así que no se usa cache_data
+    rev = st.session_state.get('rev', 0)
+    memo = st.session_state.get('filter_domain')
+    if memo is None or memo[0] != rev:
+        precios = df['Precio']
+        domain = (df['Tipo de Cliente'].unique().tolist(), float(precios.min()), float(precios.max()))
+        memo = st.session_state['filter_domain'] = (rev, domain)
+    return memo[1]
+
+def _price_histogram(precios, codigos, bins=30):
+    """Agrupa los precios en intervalos por Tipo de Cliente, para enviar a Plotly solo los conteos.
+
+    'codigos' son los códigos de la categoría Tipo de Cliente (se comparan enteros, no strings).
+    """
+    edges = np.histogram_bin_edges(precios, bins=bins)
+    categorias = CATEGORIAS['Tipo de Cliente'].categories
+    counts = {tipo: np.histogram(precios[codigos == i], bins=edges)[0] for i, tipo in enumerate(categorias)}
+    return counts, edges
+
+def _grid_options(df):
+    """Opciones de AgGrid (solo dependen de las columnas; construirlas es trivial, no se cachean)."""
+    gb = GridOptionsBuilder.from_dataframe(df)
+    gb.configure_default_column(sortable=True, filter=True, resizable=True)
+    return gb.build()
+
+def _aggrid(df, key):
+    """Tabla AgGrid de solo lectura. AgGrid modifica el DataFrame que recibe, así que se le pasa una copia."""
+    grid_df = df.copy()
+    # st_aggrid muestra las columnas datetime en ISO con hora; en la tabla basta la fecha
+    grid_df['Fecha de Servicio'] = grid_df['Fecha de Servicio'].dt.strftime('%Y-%m-%d')
+    # NO_UPDATE: la tabla no devuelve selecciones ni dispara reruns
+    AgGrid(grid_df, gridOptions=_grid_options(grid_df), update_mode=GridUpdateMode.NO_UPDATE, key=key)
+
 # --- Funcionalidad de Descarga Excel ---
-@st.cache_data
-def to_excel(df):
-    """Convierte el DataFrame a formato Excel para descarga."""
+# Formato amarillo para el encabezado (coincide con el amarillo solicitado); constante para todas las exportaciones
+EXCEL_HEADER_FORMAT = {'bg_color': '#FFC300', 'bold': True, 'align': 'center'}
+EXCEL_COLUMN_WIDTH = 20
+
+def _format_excel_header(workbook, worksheet, columns):
+    """Escribe el encabezado con formato y ajusta el ancho de las columnas."""
+    yellow_format = workbook.add_format(EXCEL_HEADER_FORMAT)
+    worksheet.write_row(0, 0, list(columns), yellow_format)
+    worksheet.set_column(0, len(columns) - 1, EXCEL_COLUMN_WIDTH)
+
+# Cada combinación de filtros guarda los bytes de un Excel: se acota la caché
+@st.cache_data(max_entries=16)
+def _to_excel_cached(content_hash, _df):
+    """Genera el Excel. Solo 'content_hash' forma la clave de caché; '_df' no se hashea."""
+    from io import BytesIO  # Import diferido: solo se necesita al exportar
+
+    df = _df
     output = BytesIO()
-    # Usamos xlsxwriter para aplicar formato, como el color amarillo en el encabezado
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Clientes')
-    
-    workbook = writer.book
-    # Formato amarillo para el encabezado (coincide con el amarillo solicitado)
-    yellow_format = workbook.add_format({'bg_color': '#FFC300', 'bold': True, 'align': 'center'}) 
-    worksheet = writer.sheets['Clientes']
-    
-    # Aplica el formato al encabezado
-    for col_num, value in enumerate(df.columns.values):
-        worksheet.write(0, col_num, value, yellow_format)
-    
-    # Ajusta el ancho de las columnas (opcional)
-    worksheet.set_column('A:L', 20) 
+    # Usamos xlsxwriter para aplicar formato, como el color amarillo en el encabezado.
+    # Los datos se escriben sin encabezado (desde la fila 1) para no escribir la fila 0 dos veces.
+    # Las fechas se guardan como datetime64, pero la exportación muestra solo la fecha
+    writer = pd.ExcelWriter(output, engine='xlsxwriter', date_format='YYYY-MM-DD', datetime_format='YYYY-MM-DD')
+    df.to_excel(writer, index=False, header=False, startrow=1, sheet_name='Clientes')
+    _format_excel_header(writer.book, writer.sheets['Clientes'], df.columns)
     
     writer.close()
     processed_data = output.getvalue()
     return processed_data
 
+@st.cache_data(max_entries=16)
+def _to_csv_cached(content_hash, _df):
+    """Genera el CSV de descarga, con la misma clave de caché que el Excel."""
+    return _df.to_csv(index=False).encode('utf-8')
+
+def _content_hash(df):
+    """Clave de caché de las descargas."""
+    # Hash del contenido (filas e índice): el DataFrame ordenado es un objeto nuevo en cada rerun
+    # y la caché es compartida entre sesiones, así que la clave debe identificar las filas exactas
+    return int(pd.util.hash_pandas_object(df).sum())
+
 # --- Funcionalidad: Ingreso de Datos (CRM) ---
 st.sidebar.header("📝 Ingreso de Nuevo Cliente")
 
@@ -102,27 +289,16 @@ with st.sidebar.form(key='crm_form'):
             st.error("Por favor, complete los campos de Empresa, RUC y Contacto.")
         else:
             # Crea el nuevo registro
-            new_entry = {
-                'Fecha de Servicio': fecha_servicio,
-                'Empresa': empresa,
-                'RUC': ruc,
-                'Tiempo de Servicio (días)': tiempo_dias,
-                '¿Conductor?': con_conductor,
-                'Precio': precio,
-                'Contacto': contacto,
-                'Email': email,
-                'Teléfono': telefono,
-                'Score (0-1000)': score,
-                'Trabajadores': trabajadores,
-                'Tipo de Cliente': tipo_cliente,
-            }
-
-            # Añade el registro al DataFrame de la sesión
-            new_df = pd.DataFrame([new_entry])
-            st.session_state['clientes_df'] = pd.concat([st.session_state['clientes_df'], new_df], ignore_index=True)
+            new_entry = (fecha_servicio, empresa, ruc, int(tiempo_dias), con_conductor, float(precio),
+                         contacto, email, telefono, int(score), int(trabajadores), tipo_cliente)
+
+            # Añade el registro a la tabla Arrow como un nuevo bloque (sin copiar las columnas existentes)
+            new_table = pa.Table.from_pylist([dict(zip(COLUMNS, new_entry))], schema=SCHEMA)
+            st.session_state['arrow'] = insert_sorted(st.session_state['arrow'], new_table, fecha_servicio)
             
-            # Guarda los datos
-            save_data()
+            # Guarda solo el nuevo registro
+            append_data(new_entry)
+            st.session_state['rev'] = st.session_state.get('rev', 0) + 1
             st.success("✅ Cliente registrado y datos guardados.")
 
 
@@ -130,7 +306,7 @@ with st.sidebar.form(key='crm_form'):
 st.title("📊 Dashboard de Gestión de Clientes (Camionetas)")
 st.markdown("---")
 
-df = st.session_state['clientes_df'].copy()
+df = clientes_df()
 
 if df.empty:
     st.info("Aún no hay datos de clientes. Use el formulario de la barra lateral para comenzar.")
@@ -140,16 +316,13 @@ else:
     col_filt1, col_filt2, col_filt3 = st.columns(3)
     
     # Filtro 1: Tipo de Cliente (Antiguo/Nuevo)
-    tipos_cliente = df['Tipo de Cliente'].unique().tolist()
+    tipos_cliente, precio_min_actual, precio_max_actual = _filter_domain(df)
     tipo_seleccionado = col_filt1.multiselect("Filtrar por Tipo de Cliente", tipos_cliente, default=tipos_cliente)
     
     # Filtro 2: Score Mínimo
     min_score = col_filt2.slider("Score Mínimo (0-1000)", 0, 1000, 0)
     
     # === INICIO DE CORRECCIÓN PARA EL SLIDER DE PRECIO ===
-    precio_min_actual = float(df['Precio'].min())
-    precio_max_actual = float(df['Precio'].max())
-
     if precio_min_actual == precio_max_actual:
         # Solución: Si min y max son iguales (ej: solo un registro), forzar un rango
         slider_min = precio_min_actual 
@@ -172,23 +345,37 @@ else:
     # === FIN DE CORRECCIÓN ===
 
     # Aplicar filtros
-    df_filtrado = df[
-        (df['Tipo de Cliente'].isin(tipo_seleccionado)) &
-        (df['Score (0-1000)'] >= min_score) &
-        (df['Precio'] >= min_price) &
-        (df['Precio'] <= max_price)
-    ]
+    precios = df['Precio'].to_numpy()
+    scores = df['Score (0-1000)'].to_numpy()
+    # Compara los códigos enteros de la categoría, no los strings
+    tipos = df['Tipo de Cliente'].cat.codes.to_numpy()
+    categorias = CATEGORIAS['Tipo de Cliente'].categories
+    codigos_seleccionados = [categorias.get_loc(t) for t in tipo_seleccionado]
+    mask = (
+        np.isin(tipos, codigos_seleccionados) &
+        (scores >= min_score) &
+        (precios >= min_price) &
+        (precios <= max_price)
+    )
+    df_filtrado = df.iloc[mask]
 
     st.markdown(f"**Mostrando {len(df_filtrado)} de {len(df)} clientes registrados.**")
     st.markdown("---")
 
-    # --- Métricas Clave (KPIs) ---
-    col1, col2, col3 = st.columns(3)
+    # Sin resultados: no hay KPIs, gráficos ni tabla filtrada que construir (los datos crudos sí se muestran)
+    if df_filtrado.empty:
+        st.info("Sin resultados para los filtros seleccionados.")
+    else:
+        # --- Métricas Clave (KPIs) ---
+        col1, col2, col3 = st.columns(3)
     
-    # Usamos markdown para dar color a los títulos, aunque el tema ya aplica colores.
-    col1.metric("Clientes Filtrados", len(df_filtrado))
-    col2.metric("Precio Promedio Filtrado", f"${df_filtrado['Precio'].mean():,.2f}" if not df_filtrado.empty else "$0.00")
-    col3.metric("Score Promedio Filtrado", f"{df_filtrado['Score (0-1000)'].mean():.0f}" if not df_filtrado.empty else "N/A")
+        # Usamos markdown para dar color a los títulos, aunque el tema ya aplica colores.
+        resumen = _resumen_por_tipo(df_filtrado)
+        n_filtrados = int(resumen['n'].sum())
+        col1.metric("Clientes Filtrados", n_filtrados)
+        # Promedios globales a partir de los promedios por tipo, ponderados por el conteo
+        col2.metric("Precio Promedio Filtrado", f"${(resumen['precio_mean'] * resumen['n']).sum() / n_filtrados:,.2f}")
+        col3.metric("Score Promedio Filtrado", f"{(resumen['score_mean'] * resumen['n']).sum() / n_filtrados:.0f}")
 
     st.markdown("---")
 
@@ -196,49 +383,72 @@ else:
     tab1, tab2, tab3 = st.tabs(["Gráficos y Tendencias", "Tabla de Datos y Descarga", "Datos Crudos (DataFrame Completo)"])
 
     with tab1:
-        st.subheader("Análisis Visual de Clientes Filtrados")
-        colA, colB = st.columns(2)
+        if not df_filtrado.empty:
+            # Import diferido: plotly es pesado y no se necesita mientras no haya datos que graficar
+            import plotly.graph_objects as go
+
+            st.subheader("Análisis Visual de Clientes Filtrados")
+            colA, colB = st.columns(2)
         
-        with colA:
-            # Gráfico de Distribución de Precios (Amarillo y Azul)
-            fig_price = px.histogram(df_filtrado, x='Precio', 
-                                     title='Distribución de Precios por Tipo de Cliente', 
-                                     color='Tipo de Cliente', 
-                                     barmode='overlay', 
-                                     color_discrete_map={'Nuevo': '#FFC300', 'Antiguo': '#007ACC'}) 
-            st.plotly_chart(fig_price, use_container_width=True)
-
-        with colB:
-            # Gráfico de Clientes Antiguos vs. Nuevos (Amarillo y Azul)
-            count_type = df_filtrado['Tipo de Cliente'].value_counts().reset_index()
-            count_type.columns = ['Tipo', 'Conteo']
-            fig_type = px.bar(count_type, x='Tipo', y='Conteo', title='Conteo de Clientes Antiguos/Nuevos', 
-                             color='Tipo', 
-                             color_discrete_map={'Nuevo': '#FFC300', 'Antiguo': '#007ACC'}) 
-            st.plotly_chart(fig_type, use_container_width=True)
+            colores = {'Nuevo': '#FFC300', 'Antiguo': '#007ACC'}
+            # uirevision fijo por figura y key estable: Plotly conserva zoom/pan y Streamlit reutiliza el componente
+
+            with colA:
+                # Gráfico de Distribución de Precios (Amarillo y Azul), con los intervalos precalculados
+                counts, edges = _price_histogram(df_filtrado['Precio'].to_numpy(dtype=float),
+                                                 df_filtrado['Tipo de Cliente'].cat.codes.to_numpy())
+                centros = (edges[:-1] + edges[1:]) / 2
+                fig_price = go.Figure([
+                    go.Bar(x=centros, y=counts[tipo], width=edges[1] - edges[0], name=tipo,
+                           marker_color=color, opacity=0.75)
+                    for tipo, color in colores.items()
+                ])
+                fig_price.update_layout(title='Distribución de Precios por Tipo de Cliente',
+                                        xaxis_title='Precio', yaxis_title='Conteo',
+                                        legend_title='Tipo de Cliente', barmode='overlay',
+                                        uirevision='precio')
+                st.plotly_chart(fig_price, use_container_width=True, key="fig-precio")
+
+            with colB:
+                # Gráfico de Clientes Antiguos vs. Nuevos (Amarillo y Azul)
+                fig_type = go.Figure(go.Bar(x=resumen.index.astype(str), y=resumen['n'],
+                                            marker_color=[colores.get(t) for t in resumen.index]))
+                fig_type.update_layout(title='Conteo de Clientes Antiguos/Nuevos',
+                                       xaxis_title='Tipo', yaxis_title='Conteo',
+                                       uirevision='tipo')
+                st.plotly_chart(fig_type, use_container_width=True, key="fig-tipo")
 
 
     with tab2:
-        st.subheader("Tabla de Clientes Filtrados y Ordenados")
-        # Ordenado por Fecha de Servicio
-        df_ordenado = df_filtrado.sort_values(by='Fecha de Servicio', ascending=False)
-        st.dataframe(df_ordenado, use_container_width=True)
+        if not df_filtrado.empty:
+            st.subheader("Tabla de Clientes Filtrados y Ordenados")
+            # Ordenado por Fecha de Servicio
+            # La tabla base ya está ordenada por fecha: basta con invertirla
+            df_ordenado = df_filtrado.iloc[::-1]
+            _aggrid(df_ordenado, key="grid-clientes")
         
-        st.markdown("---")
-        st.subheader("Exportar a Excel")
+            st.markdown("---")
+            st.subheader("Exportar a Excel")
         
-        # Botón de descarga de Excel (el color 'primary' es el azul, '#007ACC')
-        excel_data = to_excel(df_ordenado)
+            # Botón de descarga de Excel (el color 'primary' es el azul, '#007ACC')
+            content_hash = _content_hash(df_ordenado)
+            excel_data = _to_excel_cached(content_hash, df_ordenado)
         
-        st.download_button(
-            label="Descargar Datos Filtrados (.xlsx) ⬇️",
-            data=excel_data,
-            file_name=f'clientes_camionetas_{date.today()}.xlsx',
-            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            type="primary" 
-        )
-        st.caption("La descarga contiene los datos filtrados y ordenados que se muestran en la tabla superior.")
+            st.download_button(
+                label="Descargar Datos Filtrados (.xlsx) ⬇️",
+                data=excel_data,
+                file_name=f'clientes_camionetas_{date.today()}.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                type="primary" 
+            )
+            st.download_button(
+                label="Descargar Datos Filtrados (.csv) ⬇️",
+                data=_to_csv_cached(content_hash, df_ordenado),
+                file_name=f'clientes_camionetas_{date.today()}.csv',
+                mime='text/csv'
+            )
+            st.caption("La descarga contiene los datos filtrados y ordenados que se muestran en la tabla superior.")
 
     with tab3:
         st.subheader("Datos Crudos Almacenados (Sin Filtrar)")
-        st.dataframe(df.sort_values(by='Fecha de Servicio', ascending=False), use_container_width=True)
+        _aggrid(df.iloc[::-1], key="grid-crudo")
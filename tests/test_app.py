@@ -0,0 +1,187 @@
+import base64
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pyarrow as pa
+import pytest
+import streamlit as st
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+
+APP = str(Path(__file__).resolve().parent.parent / "app.py")
+
+HEADER = ("Fecha de Servicio,Empresa,RUC,Tiempo de Servicio (días),¿Conductor?,Precio,"
+          "Contacto,Email,Teléfono,Score (0-1000),Trabajadores,Tipo de Cliente\n")
+ROWS = ("2026-10-01,Transportes A,20100000001,2,Con Conductor,100.0,Ana,,,500,3,Nuevo\n"
+        "2026-10-01,Logística B,20100000002,2,Sin Conductor,100.0,Luis,,,700,8,Antiguo\n")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directorio de trabajo aislado (la app usa rutas relativas) y cachés limpias."""
+    monkeypatch.chdir(tmp_path)
+    st.cache_data.clear()
+    yield tmp_path
+    st.cache_data.clear()
+
+
+@pytest.fixture
+def descargas(monkeypatch):
+    """Captura los bytes de los botones de descarga, por nombre de archivo."""
+    guardadas = {}
+    original = MemoryMediaFileStorage.load_and_get_id
+
+    def load_and_get_id(self, path_or_data, mimetype, kind, filename=None):
+        guardadas[filename] = path_or_data
+        return original(self, path_or_data, mimetype, kind, filename)
+
+    monkeypatch.setattr(MemoryMediaFileStorage, "load_and_get_id", load_and_get_id)
+    return guardadas
+
+
+def run_app():
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_sin_datos(workdir):
+    at = run_app()
+    assert len(at.tabs) == 0
+    assert "Aún no hay datos" in at.info[0].value
+
+
+def test_con_datos_compacta_el_diario(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    assert len(at.tabs) == 3
+    assert at.metric[0].value == "2"
+    assert (workdir / "crm_data.feather").exists()
+    assert not (workdir / "crm_data_journal.csv").exists()
+
+
+def test_migra_el_csv_antiguo(workdir):
+    (workdir / "crm_data.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    assert at.metric[0].value == "2"
+    assert (workdir / "crm_data.feather").exists()
+    assert (workdir / "crm_data.csv").read_text(encoding="utf-8") == HEADER + ROWS
+
+
+def test_excel_distinto_por_filtro(workdir):
+    # Mismo conteo, fecha y precio total en ambos filtros: el Excel debe depender de las filas
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    at.multiselect[0].set_value(["Nuevo"]).run()
+    url_nuevo = at.get("download_button")[0].proto.url
+    at.multiselect[0].set_value(["Antiguo"]).run()
+    url_antiguo = at.get("download_button")[0].proto.url
+    assert url_nuevo != url_antiguo
+
+
+def test_compacta_un_diario_interrumpido(workdir):
+    (workdir / "crm_data_journal.compacting.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    assert at.metric[0].value == "2"
+    assert not (workdir / "crm_data_journal.compacting.csv").exists()
+
+
+def test_registro_va_al_diario(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    at.text_input[0].set_value("Camiones C")
+    at.text_input[1].set_value("20100000003")
+    at.text_input[2].set_value("Rosa")
+    at.button[0].click().run()
+    assert not at.exception
+    assert at.metric[0].value == "3"
+    journal = (workdir / "crm_data_journal.csv").read_text(encoding="utf-8").splitlines()
+    assert journal[0] == HEADER.strip()
+    assert journal[1].split(",")[1:3] == ["Camiones C", "20100000003"]
+
+
+def test_filtro_vacio_muestra_datos_crudos(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    at.multiselect[0].set_value([]).run()
+    assert not at.exception
+    assert "Sin resultados" in at.info[0].value
+    assert len(at.metric) == 0
+    assert len(at.tabs) == 3
+    assert at.tabs[2].subheader[0].value == "Datos Crudos Almacenados (Sin Filtrar)"
+
+
+def test_filtro_por_tipo(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    at.multiselect[0].set_value(["Antiguo"]).run()
+    assert at.metric[0].value == "1"
+    assert at.metric[2].value == "700"
+
+
+def test_exportaciones_sin_columnas_de_aggrid(workdir, descargas):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    run_app()
+    excel = next(v for k, v in descargas.items() if k.endswith(".xlsx"))
+    hoja = openpyxl.load_workbook(io.BytesIO(excel)).active
+    assert [c.value for c in hoja[1]] == HEADER.strip().split(",")
+    assert hoja["A2"].number_format == "YYYY-MM-DD"
+    assert hoja["A2"].value.date().isoformat() == "2026-10-01"
+
+    texto = next(v for k, v in descargas.items() if k.endswith(".csv")).decode("utf-8")
+    cabecera, fila = texto.splitlines()[:2]
+    assert cabecera == HEADER.strip()
+    assert fila.startswith("2026-10-01,")
+
+
+def test_histograma_cuenta_por_tipo(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    figura = json.loads(at.get("plotly_chart")[0].proto.spec)
+    # Plotly serializa los arrays de NumPy como binario en base64
+    conteos = {traza["name"]: int(np.frombuffer(base64.b64decode(traza["y"]["bdata"]), traza["y"]["dtype"]).sum())
+               for traza in figura["data"]}
+    assert conteos == {"Nuevo": 1, "Antiguo": 1}
+
+
+def test_tablas_muestran_solo_la_fecha(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    for grid in at.get("component_instance"):
+        datos = grid.proto.special_args[0].arrow_dataframe.data.data
+        fechas = pa.ipc.open_stream(datos).read_all().column("Fecha de Servicio").to_pylist()
+        assert fechas == ["2026-10-01", "2026-10-01"]
+
+
+@pytest.mark.parametrize("feather_reemplazado", [False, True])
+def test_compactacion_interrumpida_no_duplica(workdir, feather_reemplazado):
+    # Simula una caída después de escribir el Feather temporal con el diario ya incluido
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    run_app()
+    compactado = workdir / "crm_data.feather"
+    (workdir / "crm_data_journal.done.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    if not feather_reemplazado:
+        compactado.rename(workdir / "crm_data.feather.tmp")
+    st.cache_data.clear()
+
+    at = run_app()
+    assert at.metric[0].value == "2"
+    assert compactado.exists()
+    assert not (workdir / "crm_data.feather.tmp").exists()
+    assert not (workdir / "crm_data_journal.done.csv").exists()
+
+
+def test_registros_no_acumulan_bloques(workdir):
+    (workdir / "crm_data_journal.csv").write_text(HEADER + ROWS, encoding="utf-8")
+    at = run_app()
+    at.text_input[0].set_value("Camiones C")
+    at.text_input[1].set_value("20100000003")
+    at.text_input[2].set_value("Rosa")
+    for _ in range(40):
+        at.button[0].click().run()
+    assert at.metric[0].value == "42"
+    assert at.session_state["arrow"].column(0).num_chunks <= 32